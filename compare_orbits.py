@@ -26,18 +26,18 @@ class OrbitComparison:
 
 def compute_orbit_differences(orbit: OrbitData) -> OrbitComparison:
 
-    d = orbit.r_sp3 - orbit.r_nav
-    dX = d[:, 0]
-    dY = d[:, 1]
-    dZ = d[:, 2]
-    d3d = np.linalg.norm(d, axis=1)
+    dX = orbit.r_sp3[:, 0] - orbit.r_nav[:, 0]
+    dY = orbit.r_sp3[:, 1] - orbit.r_nav[:, 1]
+    dZ = orbit.r_sp3[:, 2] - orbit.r_nav[:, 2]
+    sq = dX * dX + dY * dY + dZ * dZ
+    d3d = np.sqrt(sq)
 
-    valid = np.isfinite(d3d)
+    valid = np.isfinite(sq)
     d3d_valid = d3d[valid]
 
     stats = {
         "max_3d": float(np.nanmax(d3d_valid)),
-        "rms_3d": float(np.sqrt(np.nanmean(d3d_valid ** 2))),
+        "rms_3d": float(np.sqrt(np.nanmean(sq[valid]))),
         "mean_3d": float(np.nanmean(d3d_valid)),
     }
 
@@ -53,60 +53,95 @@ def compute_orbit_differences(orbit: OrbitData) -> OrbitComparison:
 
 def save_comparison_csv(orbit: OrbitData, comp: OrbitComparison, out_path: str) -> None:
 
-    df = pd.DataFrame(
-        {
-            "time": orbit.time,
-            "X_sp3": orbit.r_sp3[:, 0],
-            "Y_sp3": orbit.r_sp3[:, 1],
-            "Z_sp3": orbit.r_sp3[:, 2],
-            "X_nav": orbit.r_nav[:, 0],
-            "Y_nav": orbit.r_nav[:, 1],
-            "Z_nav": orbit.r_nav[:, 2],
-            "dX": comp.dX,
-            "dY": comp.dY,
-            "dZ": comp.dZ,
-            "d3d": comp.d3d,
-        }
+    columns = ["time", "X_sp3", "Y_sp3", "Z_sp3", "X_nav", "Y_nav", "Z_nav",
+               "dX", "dY", "dZ", "d3d"]
+    rows = np.empty((len(orbit.time), len(columns)), dtype=object)
+    # Coarsest unit that still represents every epoch exactly (unit="auto"
+    # decides per element and would print midnight as a bare date).
+    t_ns = orbit.time.values.astype("datetime64[ns]")
+    unit = next(u for u, q in (("s", 10**9), ("ms", 10**6), ("us", 10**3), ("ns", 1))
+                if not (t_ns.view("i8") % q).any())
+    rows[:, 0] = np.datetime_as_string(t_ns, unit=unit, timezone="UTC")
+    rows[:, 1:] = np.column_stack(
+        [orbit.r_sp3, orbit.r_nav, comp.dX, comp.dY, comp.dZ, comp.d3d]
     )
-    df.to_csv(out_path, index=False)
+    np.savetxt(out_path, rows, fmt=["%s"] + ["%.6f"] * 10, delimiter=",",
+               header=",".join(columns), comments="")
 
 
-def plot_component_differences(comp: OrbitComparison, prn: str, out_prefix: str) -> None:
+plt.rcParams["figure.autolayout"] = False
 
-    fig, axes = plt.subplots(3, 1, figsize=(10, 8), sharex=True)
-    t = comp.time
+_FIGURE = None
 
-    axes[0].plot(t, comp.dX / 1e3, label="dX")
+
+def _reuse_figure(figsize) -> plt.Figure:
+
+    global _FIGURE
+    if _FIGURE is None:
+        _FIGURE = plt.figure()
+    _FIGURE.clear()
+    _FIGURE.set_size_inches(figsize)
+    return _FIGURE
+
+
+def _minmax_downsample(t: np.ndarray, y: np.ndarray, max_points: int):
+
+    n = len(y)
+    max_points = max(max_points, 2)
+    if n <= max_points:
+        return t, y
+
+    bucket = -(-n // (max_points // 2))
+    n_buckets = -(-n // bucket)
+    yb = np.pad(y, (0, n_buckets * bucket - n), mode="edge").reshape(n_buckets, bucket)
+    # NaNs are masked out so gaps do not hide a bucket's extremes; an all-NaN
+    # bucket falls back to its first sample and keeps the gap in the plot.
+    finite = ~np.isnan(yb)
+    offsets = np.arange(n_buckets) * bucket
+    i_min = np.minimum(offsets + np.where(finite, yb, np.inf).argmin(axis=1), n - 1)
+    i_max = np.minimum(offsets + np.where(finite, yb, -np.inf).argmax(axis=1), n - 1)
+    idx = np.unique(np.concatenate([i_min, i_max]))
+    return t[idx], y[idx]
+
+
+def plot_component_differences(comp: OrbitComparison, prn: str, out_prefix: str,
+                               max_points: int = 4000) -> None:
+
+    fig = _reuse_figure((10, 8))
+    axes = fig.subplots(3, 1, sharex=True)
+    t = comp.time.values.astype("datetime64[s]")
+
+    axes[0].plot(*_minmax_downsample(t, (comp.dX / 1e3).astype(np.float32), max_points), label="dX")
     axes[0].set_ylabel("dX [km]")
     axes[0].grid(True)
 
-    axes[1].plot(t, comp.dY / 1e3, label="dY", color="orange")
+    axes[1].plot(*_minmax_downsample(t, (comp.dY / 1e3).astype(np.float32), max_points), label="dY", color="orange")
     axes[1].set_ylabel("dY [km]")
     axes[1].grid(True)
 
-    axes[2].plot(t, comp.dZ / 1e3, label="dZ", color="green")
+    axes[2].plot(*_minmax_downsample(t, (comp.dZ / 1e3).astype(np.float32), max_points), label="dZ", color="green")
     axes[2].set_ylabel("dZ [km]")
     axes[2].set_xlabel("Time [UTC]")
     axes[2].grid(True)
 
     fig.suptitle(f"Orbit Component Differences (SP3 - NAV) for PRN {prn}")
-    fig.autofmt_xdate()
-    fig.tight_layout(rect=[0, 0.03, 1, 0.96])
+    fig.autofmt_xdate(bottom=0.12)
+    fig.subplots_adjust(left=0.11, right=0.97, top=0.91, hspace=0.12)
 
     fig.savefig(f"{out_prefix}_components.png", dpi=200)
-    plt.close(fig)
 
 
-def plot_3d_error(comp: OrbitComparison, prn: str, out_prefix: str) -> None:
+def plot_3d_error(comp: OrbitComparison, prn: str, out_prefix: str,
+                  max_points: int = 4000) -> None:
 
-    fig, ax = plt.subplots(figsize=(10, 4))
-    t = comp.time
-    ax.plot(t, comp.d3d, label="3D error")
+    fig = _reuse_figure((10, 4))
+    ax = fig.subplots()
+    t = comp.time.values.astype("datetime64[s]")
+    ax.plot(*_minmax_downsample(t, comp.d3d.astype(np.float32), max_points), label="3D error")
     ax.set_ylabel("||Δr|| [m]")
     ax.set_xlabel("Time [UTC]")
     ax.grid(True)
     ax.set_title(f"3D Orbit Error (SP3 - NAV) for PRN {prn}")
-    fig.autofmt_xdate()
-    fig.tight_layout()
-    fig.savefig(f"{out_prefix}_3d_error.png", dpi=200)
-    plt.close(fig)
\ No newline at end of file
+    fig.autofmt_xdate(bottom=0.22)
+    fig.subplots_adjust(left=0.09, right=0.97, top=0.9)
+    fig.savefig(f"{out_prefix}_3d_error.png", dpi=200)
\ No newline at end of file
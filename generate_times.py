@@ -7,19 +7,20 @@ Author      : F.Ahmadzade
 
 import pandas as pd
 import numpy as np
-from typing import List
 from get_time_range_sp3 import get_time_range
 
 def generate_times(start_time: pd.Timestamp, 
                   end_time: pd.Timestamp, 
-                  step: int = 30) -> List[pd.Timestamp]:
+                  step: int = 30) -> pd.DatetimeIndex:
 
-    start_ns = int(start_time.value / 1e9)
-    end_ns = int(end_time.value / 1e9)
+    start_s = start_time.value // 10**9
+    end_s = end_time.value // 10**9
     
-    times = np.arange(start_ns, end_ns + step, step)
+    times = np.arange(start_s, end_s + step, step, dtype="int64").view("datetime64[s]")
     
-    timestamps = [pd.Timestamp.fromtimestamp(t) for t in times]
+    timestamps = pd.DatetimeIndex(times)
+    if start_time.tz is not None:
+        timestamps = timestamps.tz_localize("UTC").tz_convert(start_time.tz)
     
     return timestamps
 
@@ -5,18 +5,35 @@ Description : Read SP3 data for a given PRN and extract the first and last valid
 Author      : F.Ahmadzade
 """
 
+import os
 import pandas as pd
 from typing import Tuple
 
+def _read_last_line(path: str, chunk: int = 8192) -> str:
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - chunk))
+        tail = f.read().decode()
+    lines = [line for line in tail.splitlines() if line.strip()]
+    return lines[-1] if lines else ""
+
 def get_time_range(sp3_csv_path: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
 
-    df = pd.read_csv(sp3_csv_path, parse_dates=['gps_time'])
-    
-    if df.empty:
+    head = pd.read_csv(sp3_csv_path, nrows=1, parse_dates=['gps_time'])
+    if head.empty:
         raise ValueError("Empty SP3 CSV file")
-    
-    start_time = df['gps_time'].min()
-    end_time = df['gps_time'].max()
+
+    if 'prn' in head.columns:
+        # Multi-satellite tables are ordered by PRN first, so scan every epoch.
+        times = pd.read_csv(sp3_csv_path, usecols=['gps_time'],
+                            parse_dates=['gps_time'], engine='c')['gps_time']
+        return times.min(), times.max()
+
+    # Single-satellite CSVs are time-sorted: first row and last line bound the range.
+    col = list(head.columns).index('gps_time')
+    start_time = head['gps_time'].iloc[0]
+    end_time = pd.Timestamp(_read_last_line(sp3_csv_path).split(',')[col])
     return start_time, end_time
 
 if __name__ == "__main__":
@@ -15,26 +15,29 @@ def interpolate_sp3_positions(sp3_csv: str, target_times_csv: str) -> pd.DataFra
     sp3_df = pd.read_csv(sp3_csv, parse_dates=['gps_time'])
     target_df = pd.read_csv(target_times_csv, parse_dates=['gps_time'])
     
-    sp3_times = (sp3_df['gps_time'] - sp3_df['gps_time'].min()).dt.total_seconds().values
-    target_times = (target_df['gps_time'] - sp3_df['gps_time'].min()).dt.total_seconds().values
+    sp3_ns = sp3_df['gps_time'].values.astype('datetime64[ns]').view('i8')
+    target_ns = target_df['gps_time'].values.astype('datetime64[ns]').view('i8')
+    t0 = sp3_ns.min()
     
-    X_sp3 = sp3_df['X_km'].values * 1000
-    Y_sp3 = sp3_df['Y_km'].values * 1000
-    Z_sp3 = sp3_df['Z_km'].values * 1000
+    sp3_times = (sp3_ns - t0) * 1e-9
+    target_times = (target_ns - t0) * 1e-9
     
-    spline_X = CubicSpline(sp3_times, X_sp3)
-    spline_Y = CubicSpline(sp3_times, Y_sp3)
-    spline_Z = CubicSpline(sp3_times, Z_sp3)
+    XYZ_sp3 = sp3_df[['X_km', 'Y_km', 'Z_km']].to_numpy() * 1000
     
-    X_interp = spline_X(target_times)
-    Y_interp = spline_Y(target_times)
-    Z_interp = spline_Z(target_times)
+    spline = CubicSpline(sp3_times, XYZ_sp3, axis=0)
+    
+    # Evaluate the piecewise cubic in Horner form with one interval search.
+    knots = spline.x
+    idx = np.clip(np.searchsorted(knots, target_times, side='right') - 1, 0, len(knots) - 2)
+    dt = (target_times - knots[idx])[:, None]
+    c = spline.c[:, idx]
+    XYZ_interp = ((c[0] * dt + c[1]) * dt + c[2]) * dt + c[3]
     
     result_df = pd.DataFrame({
         'gps_time': target_df['gps_time'],
-        'X_m': X_interp,
-        'Y_m': Y_interp,
-        'Z_m': Z_interp
+        'X_m': XYZ_interp[:, 0],
+        'Y_m': XYZ_interp[:, 1],
+        'Z_m': XYZ_interp[:, 2]
     })
     
     return result_df
@@ -29,6 +29,12 @@ def parse_args() -> argparse.Namespace:
         default=300,
         help="Time step [seconds] for comparison grid (default: 300).",
     )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="Number of threads for broadcast orbit propagation (default: 1).",
+    )
     parser.add_argument(
         "--outdir",
         default="orbit_comparison",
@@ -49,7 +55,8 @@ def main() -> None:
     print(f"Processing PRN {prn} ...")
     print("Reading SP3 and navigation files ...")
 
-    orbit = process_prn(args.sp3, args.nav, prn, step_seconds=args.step)
+    orbit = process_prn(args.sp3, args.nav, prn, step_seconds=args.step,
+                        num_threads=args.threads)
 
     print("Computing orbit differences ...")
     comp = compute_orbit_differences(orbit)
@@ -5,6 +5,7 @@ Description : Create 3D visualization showing precise SP3 orbit and broadcast or
 Author      : F.Ahmadzade
 """
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from typing import Optional
@@ -14,18 +15,21 @@ def plot_3d_orbits(
     sp3_csv: str,
     nav_csv: Optional[str] = None,
     prn: str = "G05",
-    save_path: str = "G05_orbit_comparison_3d.png"
+    save_path: str = "G05_orbit_comparison_3d.png",
+    max_points: int = 4000,
 ) -> None:
 
     sp3_df = pd.read_csv(sp3_csv, parse_dates=["gps_time"])
+    sp3_df = sp3_df.iloc[::max(1, -(-len(sp3_df) // max_points))]
 
     fig = plt.figure(figsize=(8, 6))
     ax = fig.add_subplot(111, projection="3d")
 
+    sp3_xyz = sp3_df[["X_m", "Y_m", "Z_m"]].to_numpy(dtype=np.float32)
     ax.plot(
-        sp3_df["X_m"],
-        sp3_df["Y_m"],
-        sp3_df["Z_m"],
+        sp3_xyz[:, 0],
+        sp3_xyz[:, 1],
+        sp3_xyz[:, 2],
         color="red",
         linewidth=1.0,
         label="SP3 precise orbit",
@@ -33,10 +37,12 @@ def plot_3d_orbits(
 
     if nav_csv is not None:
         nav_df = pd.read_csv(nav_csv, parse_dates=["time"])
+        nav_df = nav_df.iloc[::max(1, -(-len(nav_df) // max_points))]
+        nav_xyz = nav_df[["X", "Y", "Z"]].to_numpy(dtype=np.float32)
         ax.plot(
-            nav_df["X"],
-            nav_df["Y"],
-            nav_df["Z"],
+            nav_xyz[:, 0],
+            nav_xyz[:, 1],
+            nav_xyz[:, 2],
             color="blue",
             linewidth=0.8,
             alpha=0.7,
@@ -6,15 +6,16 @@ Author      : F.Ahmadzade
 """
 
 import datetime as dt
+import mmap
 from dataclasses import dataclass
-from typing import List
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
 import numpy as np
 import pandas as pd
+from numba import config as numba_config, njit, prange, set_num_threads
 
 
-def _rinex_float(s: str) -> float:
-
-    return float(s.replace("D", "E").replace("d", "e"))
+_D_EXPONENT = str.maketrans("Dd", "Ee")
 
 
 # ---------------- Data containers ---------------- #
@@ -23,61 +24,155 @@ def _rinex_float(s: str) -> float:
 class OrbitData:
 
     time: pd.DatetimeIndex
+    # (N, 3) in Fortran order so each of X, Y, Z is a contiguous column.
     r_sp3: np.ndarray
     r_nav: np.ndarray
     prn: str
 
+    @classmethod
+    def from_soa(cls, time: pd.DatetimeIndex,
+                 x_sp3: np.ndarray, y_sp3: np.ndarray, z_sp3: np.ndarray,
+                 x_nav: np.ndarray, y_nav: np.ndarray, z_nav: np.ndarray,
+                 prn: str) -> "OrbitData":
+
+        # Transposing a (3, N) block gives the Fortran-ordered (N, 3) layout.
+        r_sp3 = np.array([x_sp3, y_sp3, z_sp3], dtype=np.float64).T
+        r_nav = np.array([x_nav, y_nav, z_nav], dtype=np.float64).T
+        return cls(time=time, r_sp3=r_sp3, r_nav=r_nav, prn=prn)
+
+    def residual_f32(self) -> np.ndarray:
+
+        return (self.r_sp3 - self.r_nav).astype(np.float32)
+
+
+def _find_all(mm: mmap.mmap, pattern: bytes) -> List[int]:
+
+    positions = []
+    pos = mm.find(pattern)
+    while pos != -1:
+        positions.append(pos)
+        pos = mm.find(pattern, pos + 1)
+    return positions
+
+
+def _fixed_field(cells: np.ndarray, start: int, stop: int) -> np.ndarray:
+
+    # Columns start:stop of a fixed-width string array, as a new string array.
+    kind = cells.dtype.kind
+    width = cells.dtype.itemsize // np.dtype(f"{kind}1").itemsize
+    chars = cells.view(f"{kind}1").reshape(len(cells), width)[:, start:stop]
+    return np.ascontiguousarray(chars).view(f"{kind}{stop - start}").ravel()
+
+
+def _epoch_ns(year, month, day, hour, minute, sec) -> np.ndarray:
+
+    # Days since 1970-01-01 from the proleptic Gregorian calendar, all integer.
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 719468
+    seconds = ((days * 24 + hour) * 60 + minute) * 60
+    return seconds * 1_000_000_000 + np.rint(sec * 1e9).astype(np.int64)
+
+
+def _scan_sp3_records(sp3_path: str, prns: Optional[Iterable[str]] = None,
+                      kinds: bytes = b"P", width: int = 42):
+
+    prns = None if prns is None else list(prns)
+    targeted = prns is not None and len(prns) <= 4
+
+    # Jump straight to epoch and record lines; "+ 1" skips the newline.
+    with open(sp3_path, "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        epoch_pos = np.array(_find_all(mm, b"\n*"), dtype=np.int64) + 1
+        # For a handful of PRNs, searching each "<kind><prn>" prefix directly
+        # beats collecting every record and filtering afterwards.
+        prefixes = [b"\n" + bytes([k]) for k in kinds]
+        if targeted:
+            prefixes = [pre + prn.encode("ascii").ljust(3)
+                        for pre in prefixes for prn in prns]
+        rec_pos = np.sort(np.array(
+            [p for pre in prefixes for p in _find_all(mm, pre)], dtype=np.int64,
+        )) + 1
+
+        rec_epoch = np.searchsorted(epoch_pos, rec_pos) - 1
+        rec_prn = np.char.strip(
+            np.array([mm[p + 1:p + 4] for p in rec_pos], dtype="S3")
+        ).astype("U3")
+        keep = rec_epoch >= 0
+        if prns is not None and not targeted:
+            keep &= np.isin(rec_prn, prns)
+        rec_pos = rec_pos[keep]
+        rec_epoch = rec_epoch[keep]
+        rec_prn = rec_prn[keep]
+
+        epoch_cells = np.array([mm[p + 3:p + 31] for p in epoch_pos], dtype="S28")
+        rec_fields = np.array([mm[p + 4:p + 4 + width] for p in rec_pos],
+                              dtype=f"S{width}")
+
+    ymdhm = [_fixed_field(epoch_cells, a, b).astype(np.int64)
+             for a, b in ((0, 4), (5, 7), (8, 10), (11, 13), (14, 16))]
+    epoch_ns = _epoch_ns(*ymdhm, _fixed_field(epoch_cells, 17, 28).astype(np.float64))
+    if np.any(np.diff(epoch_ns) < 0):
+        order = np.argsort(epoch_ns[rec_epoch], kind="stable")
+        rec_epoch = rec_epoch[order]
+        rec_prn = rec_prn[order]
+        rec_fields = rec_fields[order]
+
+    return epoch_ns, rec_epoch, rec_prn, rec_fields
+
+
+def _read_sp3_all(sp3_path: str) -> pd.DataFrame:
+
+    epoch_ns, rec_epoch, rec_prn, rec_fields = _scan_sp3_records(sp3_path, width=56)
+
+    # X, Y, Z and clock are fixed 14-character fields; short or malformed
+    # records are dropped rather than failing the whole file.
+    cells = rec_fields.view("S14").reshape(-1, 4)
+    try:
+        values = cells.astype(np.float64)
+    except ValueError:
+        values = pd.DataFrame(cells.astype("U14")).apply(pd.to_numeric, errors="coerce").to_numpy()
+    valid = ~np.isnan(values).any(axis=1)
+
+    df = pd.DataFrame({
+        "gps_time": epoch_ns[rec_epoch[valid]].view("datetime64[ns]"),
+        "prn": rec_prn[valid],
+        "X_km": values[valid, 0],
+        "Y_km": values[valid, 1],
+        "Z_km": values[valid, 2],
+        "clock_offset": values[valid, 3],
+    })
+    return df.sort_values(["prn", "gps_time"], kind="stable").reset_index(drop=True)
+
+
+def read_sp3_for_prns(sp3_path: str, prns: List[str]) -> Dict[str, pd.DataFrame]:
+
+    epoch_ns, rec_epoch, rec_prn, rec_fields = _scan_sp3_records(sp3_path, set(prns))
+
+    # X, Y, Z are fixed 14-character fields: split every record in one pass.
+    xyz = rec_fields.view("S14").reshape(-1, 3).astype(np.float64)
+    xyz *= 1000.0
+
+    frames: Dict[str, pd.DataFrame] = {}
+    for sat_prn in prns:
+        mask = rec_prn == sat_prn
+        if not mask.any():
+            continue
+        time = pd.DatetimeIndex(epoch_ns[rec_epoch[mask]].view("datetime64[ns]"),
+                                name="time").tz_localize("UTC")
+        frames[sat_prn] = pd.DataFrame(xyz[mask], index=time, columns=["X", "Y", "Z"])
+    return frames
 
-def read_sp3_for_prn(sp3_path: str, prn: str) -> pd.DataFrame:
 
-    records: List[dict] = []
-    current_epoch = None
+def read_sp3_for_prn(sp3_path: str, prn: str) -> pd.DataFrame:
 
-    with open(sp3_path, "r") as f:
-        for line in f:
-            if not line.strip():
-                continue
-
-            if line.startswith("*"):
-                year = int(line[3:7])
-                month = int(line[8:10])
-                day = int(line[11:13])
-                hour = int(line[14:16])
-                minute = int(line[17:19])
-                sec = float(line[20:31])
-                sec_int = int(sec)
-                micro = int((sec - sec_int) * 1e6)
-                current_epoch = dt.datetime(
-                    year, month, day, hour, minute, sec_int, micro,
-                    tzinfo=dt.timezone.utc
-                )
-                continue
-
-            if (line[0] in ("P", "V")) and current_epoch is not None:
-                sat_prn = line[1:4].strip()
-                if sat_prn != prn:
-                    continue
-
-                x_km = float(line[4:18])
-                y_km = float(line[18:32])
-                z_km = float(line[32:46])
-
-                records.append(
-                    {
-                        "time": current_epoch,
-                        "X": x_km * 1000.0,
-                        "Y": y_km * 1000.0,
-                        "Z": z_km * 1000.0,
-                    }
-                )
-
-    if not records:
+    frames = read_sp3_for_prns(sp3_path, [prn])
+    if prn not in frames:
         raise ValueError(f"No SP3 data found for PRN {prn} in {sp3_path}")
-
-    df = pd.DataFrame.from_records(records)
-    df.set_index("time", inplace=True)
-    df.sort_index(inplace=True)
-    return df
+    return frames[prn]
 
 
 # ---------------- Broadcast ephemeris part (simplified, GPS-like) ---------------- #
@@ -111,9 +206,27 @@ class BroadcastEphemeris:
     af2: float
 
 
-def read_rinex_nav_for_prn(nav_path: str, prn: str) -> List[BroadcastEphemeris]:
+# (line, field) of each orbital element inside an 8-line RINEX 2 record, where
+# field k covers columns 3 + 19*k to 22 + 19*k.
+_NAV_FIELD_CELLS = {
+    "af0": (0, 1), "af1": (0, 2), "af2": (0, 3),
+    "crs": (1, 1), "delta_n": (1, 2), "m0": (1, 3),
+    "cuc": (2, 0), "e": (2, 1), "cus": (2, 2), "sqrt_a": (2, 3),
+    "toe": (3, 0), "cic": (3, 1), "omega0": (3, 2), "cis": (3, 3),
+    "i0": (4, 0), "crc": (4, 1), "w": (4, 2), "omega_dot": (4, 3),
+    "idot": (5, 0),
+}
+
+
+def _nav_sat_num2(line: str) -> str:
 
-    eph_list: List[BroadcastEphemeris] = []
+    sat_id_raw = line[0:3].strip()
+    if sat_id_raw.upper().startswith("G"):
+        sat_id_raw = sat_id_raw[1:]
+    return sat_id_raw.zfill(2)
+
+
+def read_rinex_nav_for_prn(nav_path: str, prn: str) -> List[BroadcastEphemeris]:
 
     prn_clean = prn.upper()
     if prn_clean.startswith("G"):
@@ -126,152 +239,225 @@ def read_rinex_nav_for_prn(nav_path: str, prn: str) -> List[BroadcastEphemeris]:
         for line in f:
             if "END OF HEADER" in line:
                 break
-        lines = f.readlines()
+        lines = [line.rstrip("\r\n") for line in f if line.strip()]
 
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        if not line.strip():
-            i += 1
-            continue
+    # A record starts on the line carrying the PRN in columns 0-2; the seven
+    # continuation lines leave those columns blank.
+    starts = [k for k, line in enumerate(lines)
+              if line[0:3].strip() and _nav_sat_num2(line) == prn_num2]
+    if not starts:
+        raise ValueError(f"No navigation ephemeris found for PRN {prn} in {nav_path}")
 
-        sat_id_raw = line[0:3].strip()
-        if sat_id_raw.upper().startswith("G"):
-            sat_num = sat_id_raw[1:]
-        else:
-            sat_num = sat_id_raw
-        sat_num2 = sat_num.zfill(2)
-
-        if sat_num2 == prn_num2:
-            year = int(line[3:5])
-            year += 2000 if year < 80 else 1900
-            month = int(line[6:8])
-            day = int(line[9:11])
-            hour = int(line[12:14])
-            minute = int(line[15:17])
-            sec = float(line[18:22])
-            toc = dt.datetime(year, month, day, hour, minute, int(sec),
-                              tzinfo=dt.timezone.utc)
-
-            af0 = _rinex_float(line[22:41])
-            af1 = _rinex_float(line[41:60])
-            af2 = _rinex_float(line[60:79])
-
-            l2 = lines[i + 1]
-            l3 = lines[i + 2]
-            l4 = lines[i + 3]
-            l5 = lines[i + 4]
-            l6 = lines[i + 5]
-            l7 = lines[i + 6]
-            l8 = lines[i + 7]
-
-            crs = _rinex_float(l2[22:41])
-            delta_n = _rinex_float(l2[41:60])
-            m0 = _rinex_float(l2[60:79])
-
-            cuc = _rinex_float(l3[3:22])
-            e = _rinex_float(l3[22:41])
-            cus = _rinex_float(l3[41:60])
-            sqrt_a = _rinex_float(l3[60:79])
-
-            toe = _rinex_float(l4[3:22])
-            cic = _rinex_float(l4[22:41])
-            omega0 = _rinex_float(l4[41:60])
-            cis = _rinex_float(l4[60:79])
-
-            i0 = _rinex_float(l5[3:22])
-            crc = _rinex_float(l5[22:41])
-            w = _rinex_float(l5[41:60])
-            omega_dot = _rinex_float(l5[60:79])
-
-            idot = _rinex_float(l6[3:22])
-            # rest of l6 + l7 + l8 ignored
-
-            eph = BroadcastEphemeris(
-                toc=toc,
-                sqrt_a=sqrt_a,
-                e=e,
-                i0=i0,
-                omega0=omega0,
-                w=w,
-                m0=m0,
-                delta_n=delta_n,
-                idot=idot,
-                omega_dot=omega_dot,
-                cuc=cuc,
-                cus=cus,
-                crc=crc,
-                crs=crs,
-                cic=cic,
-                cis=cis,
-                toe=toe,
-                af0=af0,
-                af1=af1,
-                af2=af2,
-            )
-            eph_list.append(eph)
-            i += 8
-        else:
-            i += 1
+    blocks = []
+    for k in starts:
+        block = lines[k:k + 8]
+        if len(block) < 8 or any(line[0:3].strip() for line in block[1:]):
+            raise ValueError(f"Truncated navigation record for PRN {prn} in {nav_path}")
+        blocks.append(block)
+    blocks = np.array(blocks, dtype=object)
+
+    # Cut every line of every record into its four 19-character fields at once.
+    cells = np.array([line[3:79].ljust(76) for line in blocks.ravel()], dtype="U76")
+    cells = cells.view("U19").reshape(len(blocks), 8, 4)
+    rows = [cell[0] for cell in _NAV_FIELD_CELLS.values()]
+    cols = [cell[1] for cell in _NAV_FIELD_CELLS.values()]
+    values = np.char.translate(cells[:, rows, cols], _D_EXPONENT).astype(np.float64)
+    params = dict(zip(_NAV_FIELD_CELLS, values.T))
+
+    heads = np.array([line[3:22] for line in blocks[:, 0]], dtype="U19")
+    year, month, day, hour, minute = (
+        _fixed_field(heads, a, b).astype(np.int64)
+        for a, b in ((0, 2), (3, 5), (6, 8), (9, 11), (12, 14))
+    )
+    year += np.where(year < 80, 2000, 1900)
+    sec = np.floor(_fixed_field(heads, 15, 19).astype(np.float64))
+    toc_ns = _epoch_ns(year, month, day, hour, minute, sec)
 
-    eph_list.sort(key=lambda e: e.toc)
-    if not eph_list:
-        raise ValueError(f"No navigation ephemeris found for PRN {prn} in {nav_path}")
+    order = np.argsort(toc_ns, kind="stable")
+    tocs = pd.DatetimeIndex(toc_ns[order].view("datetime64[ns]")).tz_localize("UTC")
+    return [
+        BroadcastEphemeris(toc=toc.to_pydatetime(),
+                           **{name: float(arr[k]) for name, arr in params.items()})
+        for toc, k in zip(tocs, order)
+    ]
+
+
+def _select_eph_indices(toc_ns: np.ndarray, qs: np.ndarray) -> np.ndarray:
+
+    sel = np.searchsorted(toc_ns, qs, side="right") - 1
+    return np.maximum(sel, 0)
+
+
+# Precomputed sin E / cos E over (M, e) for the optional table-based Kepler path
+# (fast=True). Bilinear lookup on this grid stays within about 3 m of the exact
+# solve for e < 0.05; coarser e spacing grows the error quadratically.
+_KEPLER_M_GRID = np.linspace(0.0, 2 * np.pi, 2048)
+_KEPLER_E_GRID = np.linspace(0.0, 0.05, 64)
+
+
+def _kepler_tables():
+
+    M, e = np.meshgrid(_KEPLER_M_GRID, _KEPLER_E_GRID, indexing="ij")
+    E = M.copy()
+    for _ in range(20):
+        E = E - (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+    return np.sin(E), np.cos(E)
+
+
+_KEPLER_SIN_TAB, _KEPLER_COS_TAB = _kepler_tables()
+
+
+_EPH_FIELDS = (
+    "sqrt_a", "e", "i0", "omega0", "w", "m0", "delta_n", "idot", "omega_dot",
+    "cuc", "cus", "crc", "crs", "cic", "cis", "toe",
+)
+
+
+def _eph_arrays(eph_list: List[BroadcastEphemeris]) -> Dict[str, np.ndarray]:
+
+    return {
+        name: np.array([getattr(e, name) for e in eph_list], dtype=np.float64)
+        for name in _EPH_FIELDS
+    }
+
+
+_KERNEL_FIELDS = (
+    "a", "n", "sqrt_1me2", "omega_t0", "omega_rate",
+    "e", "i0", "w", "m0", "idot", "cuc", "cus", "crc", "crs", "cic", "cis",
+)
+
+
+def _eph_consts(eph_arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+
+    a = eph_arrays["sqrt_a"] ** 2
+    return {
+        **eph_arrays,
+        "a": a,
+        "n": np.sqrt(MU_EARTH / a ** 3) + eph_arrays["delta_n"],
+        "sqrt_1me2": np.sqrt(1 - eph_arrays["e"] ** 2),
+        "omega_t0": eph_arrays["omega0"] - OMEGA_E_DOT * eph_arrays["toe"],
+        "omega_rate": eph_arrays["omega_dot"] - OMEGA_E_DOT,
+    }
+
+
+@njit(fastmath=True, parallel=True, cache=True)
+def _kepler_ecef(tk, sel, fast, sin_tab, cos_tab,
+                 a, n, sqrt_1me2, omega_t0, omega_rate,
+                 e, i0, w, m0, idot, cuc, cus, crc, crs, cic, cis):
+
+    n_m = sin_tab.shape[0]
+    n_e = sin_tab.shape[1]
+    dM = 2 * np.pi / (n_m - 1)
+    de = _KEPLER_E_GRID[-1] / (n_e - 1)
+
+    xyz = np.empty((tk.shape[0], 3))
+    for k in prange(tk.shape[0]):
+        j = sel[k]
+        ej = e[j]
+
+        M = m0[j] + n[j] * tk[k]
+
+        if fast and ej < _KEPLER_E_GRID[-1]:
+            # Bilinear lookup of sin E / cos E in the precomputed (M, e) table.
+            fm = (M % (2 * np.pi)) / dM
+            im = min(int(fm), n_m - 2)
+            tm = fm - im
+            fe = ej / de
+            ie = min(int(fe), n_e - 2)
+            te = fe - ie
+            w00 = (1 - tm) * (1 - te)
+            w01 = (1 - tm) * te
+            w10 = tm * (1 - te)
+            w11 = tm * te
+            sin_E = (w00 * sin_tab[im, ie] + w01 * sin_tab[im, ie + 1]
+                     + w10 * sin_tab[im + 1, ie] + w11 * sin_tab[im + 1, ie + 1])
+            cos_E = (w00 * cos_tab[im, ie] + w01 * cos_tab[im, ie + 1]
+                     + w10 * cos_tab[im + 1, ie] + w11 * cos_tab[im + 1, ie + 1])
+        elif ej < 0.05:
+            # Near-circular closed-form start plus one Newton correction; the
+            # residual stays below 1e-11 rad only up to about e = 0.05.
+            E = np.arctan2(np.sin(M), np.cos(M) - ej)
+            E = E + 2 * np.pi * np.round((M - E) / (2 * np.pi))
+            E = E - (E - ej * np.sin(E) - M) / (1 - ej * np.cos(E))
+            sin_E = np.sin(E)
+            cos_E = np.cos(E)
+        else:
+            # Danby's quartic Newton step, one sin/cos pair per iteration.
+            E = M + 0.85 * ej * np.sign(np.sin(M))
+            for it in range(4):
+                sin_E = np.sin(E)
+                cos_E = np.cos(E)
+                f = E - ej * sin_E - M
+                if abs(f) < 1e-12 or it == 3:
+                    break
+                fp = 1 - ej * cos_E
+                fpp = ej * sin_E
+                fppp = ej * cos_E
+                d1 = -f / fp
+                d2 = -f / (fp + d1 * fpp / 2)
+                d3 = -f / (fp + d2 * fpp / 2 + d2 * d2 * fppp / 6)
+                E = E + d3
 
-    return eph_list
+        v = np.arctan2(sqrt_1me2[j] * sin_E, cos_E - ej)
 
+        phi = v + w[j]
 
-def _select_eph_for_time(eph_list: List[BroadcastEphemeris],
-                         t: dt.datetime) -> BroadcastEphemeris:
+        # Same-argument sin/cos pairs are fused into one sincos under fastmath.
+        sin_2phi = np.sin(2 * phi)
+        cos_2phi = np.cos(2 * phi)
 
-    candidates = [e for e in eph_list if e.toc <= t]
-    if not candidates:
-        return eph_list[0]
-    return candidates[-1]
+        du = cus[j] * sin_2phi + cuc[j] * cos_2phi
+        dr = crs[j] * sin_2phi + crc[j] * cos_2phi
+        di = cis[j] * sin_2phi + cic[j] * cos_2phi
 
+        u = phi + du
+        r = a[j] * (1 - ej * cos_E) + dr
+        i = i0[j] + di + idot[j] * tk[k]
 
-def compute_ecef_from_nav(eph: BroadcastEphemeris, t: dt.datetime) -> np.ndarray:
+        omega = omega_t0[j] + omega_rate[j] * tk[k]
 
-    tk = (t - eph.toc).total_seconds()
+        cos_u = np.cos(u)
+        sin_u = np.sin(u)
+        x_orb = r * cos_u
+        y_orb = r * sin_u
 
-    a = eph.sqrt_a ** 2
-    n0 = np.sqrt(MU_EARTH / a ** 3)
-    n = n0 + eph.delta_n
+        cos_o = np.cos(omega)
+        sin_o = np.sin(omega)
+        cos_i = np.cos(i)
+        sin_i = np.sin(i)
 
-    M = eph.m0 + n * tk
+        xyz[k, 0] = x_orb * cos_o - y_orb * cos_i * sin_o
+        xyz[k, 1] = x_orb * sin_o + y_orb * cos_i * cos_o
+        xyz[k, 2] = y_orb * sin_i
 
-    E = M
-    for _ in range(10):
-        E = M + eph.e * np.sin(E)
+    return xyz
 
-    v = np.arctan2(np.sqrt(1 - eph.e ** 2) * np.sin(E),
-                   np.cos(E) - eph.e)
 
-    phi = v + eph.w
+def _nav_ecef(eph_arrays: Dict[str, np.ndarray], sel: np.ndarray,
+              tk: np.ndarray, fast: bool = False) -> np.ndarray:
 
-    du = eph.cus * np.sin(2 * phi) + eph.cuc * np.cos(2 * phi)
-    dr = eph.crs * np.sin(2 * phi) + eph.crc * np.cos(2 * phi)
-    di = eph.cis * np.sin(2 * phi) + eph.cic * np.cos(2 * phi)
+    # fast=True trades up to ~3 m of position accuracy for skipping the
+    # Kepler solve when e < 0.05 (see _KEPLER_E_GRID).
+    consts = _eph_consts(eph_arrays)
+    return _kepler_ecef(tk, sel, fast, _KEPLER_SIN_TAB, _KEPLER_COS_TAB,
+                        *(consts[name] for name in _KERNEL_FIELDS))
 
-    u = phi + du
-    r = a * (1 - eph.e * np.cos(E)) + dr
-    i = eph.i0 + di + eph.idot * tk
 
-    omega = eph.omega0 + (eph.omega_dot - OMEGA_E_DOT) * tk - OMEGA_E_DOT * eph.toe
+def compute_ecef_from_nav(eph: BroadcastEphemeris, tk: np.ndarray,
+                          fast: bool = False) -> np.ndarray:
 
-    x_orb = r * np.cos(u)
-    y_orb = r * np.sin(u)
+    tk = np.atleast_1d(np.asarray(tk, dtype=np.float64))
+    sel = np.zeros(tk.shape[0], dtype=np.intp)
+    return _nav_ecef(_eph_arrays([eph]), sel, tk, fast=fast)
 
-    cos_o = np.cos(omega)
-    sin_o = np.sin(omega)
-    cos_i = np.cos(i)
-    sin_i = np.sin(i)
 
-    X = x_orb * cos_o - y_orb * cos_i * sin_o
-    Y = x_orb * sin_o + y_orb * cos_i * cos_o
-    Z = y_orb * sin_i
+@lru_cache(maxsize=8)
+def _build_epoch_grid_ns(t_start_ns: int, t_end_ns: int, step_seconds: int) -> np.ndarray:
 
-    return np.array([X, Y, Z])
+    # Shared between calls with the same span and step, so hand it out read-only.
+    qs = np.arange(t_start_ns, t_end_ns + 1, step_seconds * 1_000_000_000, dtype=np.int64)
+    qs.flags.writeable = False
+    return qs
 
 
 def build_common_orbit(
@@ -279,38 +465,33 @@ def build_common_orbit(
     eph_list: List[BroadcastEphemeris],
     prn: str,
     step_seconds: int = 300,
+    fast: bool = False,
 ) -> OrbitData:
 
-    t_start = sp3_df.index[0]
-    t_end = sp3_df.index[-1]
-    time_index = pd.date_range(
-        t_start, t_end, freq=f"{step_seconds}s", tz=dt.timezone.utc
-    )
-
-    r_sp3 = np.zeros((len(time_index), 3))
-    r_nav = np.zeros((len(time_index), 3))
-
-    for k, t in enumerate(time_index):
-        if t in sp3_df.index:
-            r_sp3[k, :] = sp3_df.loc[t, ["X", "Y", "Z"]].to_numpy()
-        else:
-            before = sp3_df.index[sp3_df.index <= t]
-            after = sp3_df.index[sp3_df.index >= t]
-            if not len(before) or not len(after):
-                r_sp3[k, :] = np.nan
-            else:
-                t0 = before[-1]
-                t1 = after[0]
-                if t0 == t1:
-                    r_sp3[k, :] = sp3_df.loc[t0, ["X", "Y", "Z"]].to_numpy()
-                else:
-                    f = (t - t0).total_seconds() / (t1 - t0).total_seconds()
-                    p0 = sp3_df.loc[t0, ["X", "Y", "Z"]].to_numpy()
-                    p1 = sp3_df.loc[t1, ["X", "Y", "Z"]].to_numpy()
-                    r_sp3[k, :] = (1 - f) * p0 + f * p1
-
-        eph = _select_eph_for_time(eph_list, t.to_pydatetime())
-        r_nav[k, :] = compute_ecef_from_nav(eph, t.to_pydatetime())
+    ts = sp3_df.index.values.astype("datetime64[ns]").view("i8")
+    P = sp3_df[["X", "Y", "Z"]].to_numpy(dtype=np.float64, copy=False)
+
+    qs = _build_epoch_grid_ns(int(ts[0]), int(ts[-1]), step_seconds)
+    time_index = pd.DatetimeIndex(qs.view("datetime64[ns]")).tz_localize(dt.timezone.utc)
+
+    if len(ts) == 1:
+        # A lone epoch brackets itself; the t1 == t0 case below returns it as is.
+        ts = np.repeat(ts, 2)
+        P = np.repeat(P, 2, axis=0)
+    idx = np.clip(np.searchsorted(ts, qs), 1, len(ts) - 1)
+    t0 = ts[idx - 1]
+    t1 = ts[idx]
+    span = t1 - t0
+    f = np.divide(qs - t0, span, out=np.ones(len(qs)), where=span != 0)
+    r_sp3 = np.empty((len(time_index), 3), order="F")
+    for c in range(3):
+        r_sp3[:, c] = (1 - f) * P[idx - 1, c] + f * P[idx, c]
+    r_sp3[(qs < ts[0]) | (qs > ts[-1])] = np.nan
+
+    toc_ns = pd.DatetimeIndex([e.toc for e in eph_list]).as_unit("ns").asi8
+    eph_idx = _select_eph_indices(toc_ns, qs)
+    tk = (qs - toc_ns[eph_idx]) * 1e-9
+    r_nav = np.asfortranarray(_nav_ecef(_eph_arrays(eph_list), eph_idx, tk, fast=fast))
 
     return OrbitData(time=time_index, r_sp3=r_sp3, r_nav=r_nav, prn=prn)
 
@@ -320,9 +501,13 @@ def process_prn(
     nav_path: str,
     prn: str,
     step_seconds: int = 300,
+    fast: bool = False,
+    num_threads: int = 1,
 ) -> OrbitData:
 
+    set_num_threads(max(1, min(num_threads, numba_config.NUMBA_NUM_THREADS)))
     sp3_df = read_sp3_for_prn(sp3_path, prn)
     eph_list = read_rinex_nav_for_prn(nav_path, prn)
-    orbit = build_common_orbit(sp3_df, eph_list, prn, step_seconds=step_seconds)
+    orbit = build_common_orbit(sp3_df, eph_list, prn, step_seconds=step_seconds,
+                               fast=fast)
     return orbit
\ No newline at end of file